@@ -0,0 +1,64 @@
+import random
+import timeit
+import arcade
+import main
+
+# Параметры замера
+FRAMES = 2000  # Количество кадров на каждый замер
+SPEEDS = [main.MAX_SPEED, 10.0, 30.0]  # Скорости машины (пикселей за кадр)
+LAYERS = ['collision', 'cars']  # Слои, участвующие в столкновениях
+
+
+def make_level(level, car, count=200):
+    """Карта уровня по чанкам и случайные стартовые положения машины,
+    в которых она ни с чем не пересекается"""
+    tilemap = arcade.load_tilemap(f'assets/levels/level{level}.tmx', main.TILE_SCALING)
+    width = tilemap.width * tilemap.tile_width
+    height = tilemap.height * tilemap.tile_height
+    tile_map = main.ChunkedMap(tilemap, LAYERS)
+    rnd = random.Random(level)
+    states = []
+    while len(states) < count:
+        x, y, angle = rnd.uniform(0, width), rnd.uniform(0, height), rnd.uniform(0, 360)
+        car.place(x, y, angle)
+        lists = [sprite_list for layer in LAYERS for sprite_list in tile_map.nearby(layer, car.state)]
+        if not arcade.check_for_collision_with_lists(car, lists):
+            states.append((x, y, angle))
+    return tile_map, states
+
+
+def run_frames(car, engine, tile_map, states, speed, swept):
+    """Кадры так же, как в GameView.on_update: шаг машины (со сдвигом по
+    времени касания или без него), физический движок и проверка машин"""
+    for i in range(FRAMES):
+        car.place(*states[i % len(states)])
+        state = car.state
+        state.speed = speed
+        walls = tile_map.nearby('collision', state, speed)
+        cars = tile_map.nearby('cars', state, speed)
+        car.update(walls + cars if swept else ())
+        car.sync_to_sprite()
+        engine.walls[:] = walls
+        engine.update()
+        arcade.check_for_collision_with_lists(car, cars)
+
+
+def main_benchmark():
+    """Сравнение стоимости кадра с дискретной проверкой столкновений
+    и с непрерывной проверкой поверх дискретной"""
+    car = main.PlayerCar('assets/images/car.png', main.PLAYER_SCALING)
+    engine = arcade.PhysicsEngineSimple(car, walls=[])
+    print(f"{'level':>5} {'speed':>6} {'discrete, us':>13} {'swept+discrete, us':>19} {'overhead':>9}")
+    for level in range(1, len(main.LEVELS_DATA) + 1):
+        tile_map, states = make_level(level, car)
+        for speed in SPEEDS:
+            discrete = timeit.timeit(
+                lambda: run_frames(car, engine, tile_map, states, speed, False), number=1) / FRAMES
+            swept = timeit.timeit(
+                lambda: run_frames(car, engine, tile_map, states, speed, True), number=1) / FRAMES
+            print(f"{level:>5} {speed:>6.1f} {discrete * 1e6:>13.1f} {swept * 1e6:>19.1f} "
+                  f"{(swept / discrete - 1) * 100:>8.0f}%")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,126 @@
+import json
+import zlib
+import base64
+import binascii
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Сколько лучших заездов хранится для каждого уровня
+TOP_RUNS = 10
+# Размер записи одного тика: x, y и угол в float32
+TICK_SIZE = 12
+# Самый длинный принимаемый заезд (10 минут при 60 кадрах в секунду)
+MAX_TICKS = 60 * 60 * 10
+
+
+def trace_ticks(data):
+    """Проверка записи заезда и подсчет тиков в ней.
+    При неверной записи выбрасывает ValueError."""
+    try:
+        packed = base64.b64decode(data, validate=True)
+        decompressor = zlib.decompressobj()
+        raw = decompressor.decompress(packed, MAX_TICKS * TICK_SIZE + 1)
+    except (binascii.Error, zlib.error, TypeError) as e:
+        raise ValueError(f'bad trace: {e}')
+    if not decompressor.eof or decompressor.unconsumed_tail:
+        raise ValueError('bad trace: truncated or too long')
+    if not raw or len(raw) % TICK_SIZE or len(raw) > MAX_TICKS * TICK_SIZE:
+        raise ValueError('bad trace: wrong length')
+    return len(raw) // TICK_SIZE
+
+
+class Leaderboard:
+    """Хранилище лучших заездов в памяти (локальная замена сервера)"""
+    def __init__(self):
+        self.runs = {}  # Заезды по уровням, отсортированные по времени
+        self.lock = threading.Lock()
+
+    def add_runs(self, runs):
+        """Добавление пачки заездов. Время заезда считается по самой записи,
+        а не берется у клиента; при неверном заезде пачка отклоняется целиком
+        с ValueError."""
+        checked = []
+        for run in runs:
+            level = run['level']
+            if not isinstance(level, int) or level < 1:
+                raise ValueError('bad level')
+            checked.append((level, {'ticks': trace_ticks(run['trace']), 'trace': run['trace']}))
+
+        with self.lock:
+            for level, run in checked:
+                level_runs = self.runs.setdefault(level, [])
+                level_runs.append(run)
+                level_runs.sort(key=lambda r: r['ticks'])
+                del level_runs[TOP_RUNS:]
+
+    def best(self, levels):
+        """Лучшие заезды для указанных уровней"""
+        with self.lock:
+            return {str(level): self.runs[level][0] for level in levels if self.runs.get(level)}
+
+
+class LeaderboardHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов: POST /runs и GET /ghosts?levels=1,2"""
+    leaderboard = Leaderboard()
+
+    def _send_json(self, status, payload):
+        """Отправка ответа в формате JSON"""
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        """Прием пачки заездов"""
+        if urlparse(self.path).path != '/runs':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length).decode('utf-8'))
+            self.leaderboard.add_runs(payload['runs'])
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {'error': 'bad request'})
+            return
+        self._send_json(200, {'accepted': len(payload['runs'])})
+
+    def do_GET(self):
+        """Выдача лучших заездов (призраков) по уровням"""
+        url = urlparse(self.path)
+        if url.path != '/ghosts':
+            self._send_json(404, {'error': 'not found'})
+            return
+        try:
+            levels = [int(level) for level in parse_qs(url.query).get('levels', [''])[0].split(',') if level]
+        except ValueError:
+            self._send_json(400, {'error': 'bad request'})
+            return
+        self._send_json(200, self.leaderboard.best(levels))
+
+    def log_message(self, format, *args):
+        """Отключение логирования каждого запроса"""
+        pass
+
+
+def main():
+    """Запуск локального сервера рекордов"""
+    parser = argparse.ArgumentParser(description='Локальный сервер рекордов Parking Pro')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), LeaderboardHandler)
+    print(f'Сервер рекордов запущен на http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,17 @@ import arcade
 import math
 import sqlite3
 import random
+import os
+import gzip
+import time
+import json
+import zlib
+import base64
+import queue
+import threading
+import urllib.request
+import urllib.error
+from array import array
 from pyglet.graphics import Batch
 
 # Константы для настройки игры
@@ -18,6 +29,12 @@ DECELERATION_RATE = 0.15  # Замедление при отпускании к
 MAX_SPEED = 3.0  # Максимальная скорость автомобиля
 TURN_SPEED = 1  # Скорость поворота
 FRICTION = 0.1  # Трение для естественного замедления
+SWEEP_EPSILON = 0.01  # Зазор, с которым машина останавливается у препятствия
+
+# Параметры подгрузки карты по чанкам
+CHUNK_SIZE = 8  # Размер чанка в тайлах
+CHUNK_LOAD_RADIUS = 1  # Сколько чанков вокруг экрана держать загруженными
+CHUNK_UNLOAD_RADIUS = 2  # Чанки дальше этого радиуса выгружаются
 
 # Данные уровней: начальная позиция и границы парковочного места
 LEVELS_DATA = [
@@ -41,20 +58,154 @@ LEVELS_DATA = [
 # Режим отладки (бессмертие и доступ ко всем уровням)
 CHEAT_MODE = False
 
+# Таблица рекордов и машины-призраки
+LEADERBOARD_URL = 'http://127.0.0.1:8765'  # Адрес сервера рекордов
+LEADERBOARD_TIMEOUT = 3  # Таймаут запросов к серверу (секунды)
+LEADERBOARD_MAX_PENDING = 50  # Сколько неотправленных заездов хранить для повтора
+GHOSTS_DB = 'ghosts.db'  # Локальный кэш призраков
+GHOST_ALPHA = 110  # Прозрачность машины-призрака
 
-class PlayerCar(arcade.Sprite):
-    """Класс игрового автомобиля, наследующий от arcade.Sprite"""
-    def __init__(self, filename, scale):
-        super().__init__(filename, scale)
+# Телеметрия заездов (выключена по умолчанию)
+TELEMETRY_ENABLED = False  # Запись телеметрии
+TELEMETRY_DIR = 'telemetry'  # Папка для файлов телеметрии
+TELEMETRY_CAPACITY = 4096  # Размер кольцевого буфера (записей)
+TELEMETRY_FLUSH_INTERVAL = 1.0  # Период сброса буфера на диск (секунды)
+TELEMETRY_FILE_SIZE = 4 * 1024 * 1024  # Размер файла до ротации (байты до сжатия)
+TELEMETRY_MAX_FILES = 20  # Сколько последних файлов хранить
+# Поля записи: заезд, тик, уровень, x, y, угол, скорость, клавиши, событие
+TELEMETRY_FIELDS = 9
+# Коды событий
+EVENT_NONE = 0
+EVENT_WALL = 1  # Упор в стену
+EVENT_CRASH = 2  # Столкновение с машиной
+EVENT_COMPLETE = 3  # Успешная парковка
+# Биты нажатых клавиш
+INPUT_FORWARD = 1
+INPUT_BACKWARD = 2
+INPUT_LEFT = 4
+INPUT_RIGHT = 8
+
+
+def sweep_polygons(moving, dx, dy, static):
+    """Время первого касания (от 0 до 1) выпуклого многоугольника moving,
+    смещаемого на (dx, dy), со статичным многоугольником static.
+    Возвращает None, если касания нет или фигуры пересекаются изначально."""
+    enter, leave = -math.inf, math.inf
+    for polygon in (moving, static):
+        for i in range(len(polygon)):
+            # Нормаль к ребру - потенциальная разделяющая ось
+            x1, y1 = polygon[i - 1]
+            x2, y2 = polygon[i]
+            nx, ny = y1 - y2, x2 - x1
+
+            a = [x * nx + y * ny for x, y in moving]
+            b = [x * nx + y * ny for x, y in static]
+            a_min, a_max, b_min, b_max = min(a), max(a), min(b), max(b)
+            velocity = dx * nx + dy * ny
+
+            if velocity == 0:
+                # Без движения вдоль оси проекции не сблизятся
+                if a_max <= b_min or a_min >= b_max:
+                    return None
+                continue
+            if velocity > 0:
+                t_enter = (b_min - a_max) / velocity
+                t_leave = (b_max - a_min) / velocity
+            else:
+                t_enter = (b_max - a_min) / velocity
+                t_leave = (b_min - a_max) / velocity
+
+            enter = max(enter, t_enter)
+            leave = min(leave, t_leave)
+            if enter > leave or enter > 1 or leave < 0:
+                return None
+
+    # Изначальное пересечение разрешает физический движок
+    if enter < 0:
+        return None
+    return enter
+
+
+class CarState:
+    """Компактное кинематическое состояние машины. Физика работает с ним
+    напрямую, без обращения к свойствам спрайта; точки и границы хитбокса
+    пересчитываются один раз за тик."""
+    __slots__ = ('x', 'y', 'angle', 'speed', 'angle_speed',
+                 'shape', 'points', 'left', 'right', 'bottom', 'top')
+
+    def __init__(self, shape, x=0.0, y=0.0, angle=0.0):
+        self.x = x  # Координаты центра
+        self.y = y
+        self.angle = angle  # Угол поворота (градусы, по часовой стрелке)
         self.speed = 0  # Текущая скорость автомобиля
         self.angle_speed = 0  # Скорость вращения
+        self.shape = shape  # Точки хитбокса относительно центра (с учетом масштаба)
+        self.points = []  # Точки хитбокса на карте
+        self.left = self.right = self.bottom = self.top = 0.0  # Границы хитбокса
+        self.update_bounds()
 
-    def update(self):
-        """Обновление позиции и состояния автомобиля каждый кадр"""
+    def update_bounds(self):
+        """Пересчет точек и границ хитбокса (так же, как в arcade)"""
+        rad = math.radians(-self.angle)
+        rad_cos = math.cos(rad)
+        rad_sin = math.sin(rad)
+        x, y = self.x, self.y
+        self.points = [(px * rad_cos - py * rad_sin + x, px * rad_sin + py * rad_cos + y)
+                       for px, py in self.shape]
+        xs = [point[0] for point in self.points]
+        ys = [point[1] for point in self.points]
+        self.left, self.right = min(xs), max(xs)
+        self.bottom, self.top = min(ys), max(ys)
+
+    def shift(self, dx, dy):
+        """Сдвиг машины без пересчета поворота хитбокса"""
+        self.x += dx
+        self.y += dy
+        self.points = [(px + dx, py + dy) for px, py in self.points]
+        self.left += dx
+        self.right += dx
+        self.bottom += dy
+        self.top += dy
+
+    def sweep(self, dx, dy, obstacles):
+        """Поиск первого препятствия на пути машины за кадр.
+        Возвращает долю пути до касания и само препятствие."""
+        # Область, которую машина заметает за кадр
+        left = self.left + min(dx, 0)
+        right = self.right + max(dx, 0)
+        bottom = self.bottom + min(dy, 0)
+        top = self.top + max(dy, 0)
+
+        best_t, best = 1.0, None
+        for sprite_list in obstacles:
+            for spr in sprite_list:
+                if spr.right < left or spr.left > right or spr.top < bottom or spr.bottom > top:
+                    continue
+                t = sweep_polygons(self.points, dx, dy, spr.hit_box.get_adjusted_points())
+                if t is not None and t < best_t:
+                    best_t, best = t, spr
+
+        if best is not None:
+            # Останавливаемся чуть раньше, чтобы не касаться препятствия
+            best_t = max(0.0, best_t - SWEEP_EPSILON / math.hypot(dx, dy))
+        return best_t, best
+
+    def step(self, obstacles=()):
+        """Шаг физики за кадр. Возвращает препятствие, в которое машина уперлась"""
         # Движение вперед/назад с учетом угла поворота
         angle_rad = math.radians(self.angle)
-        self.center_x += self.speed * math.sin(angle_rad)
-        self.center_y += self.speed * math.cos(angle_rad)
+        dx = self.speed * math.sin(angle_rad)
+        dy = self.speed * math.cos(angle_rad)
+
+        # Непрерывная проверка столкновений: сдвиг ограничивается первым
+        # касанием, поэтому на любой скорости машина не проскакивает
+        # препятствия; скорость сохраняется, чтобы у стены можно было повернуть
+        hit = None
+        distance = 1.0
+        if dx or dy:
+            distance, hit = self.sweep(dx, dy, obstacles)
+        self.x += dx * distance
+        self.y += dy * distance
         
         # Поворот только при движении (как у реальной машины)
         self.angle += self.angle_speed * self.speed if abs(self.speed) > 0.1 else 0
@@ -74,6 +225,409 @@ class PlayerCar(arcade.Sprite):
         if abs(self.speed) > MAX_SPEED:
             self.speed = MAX_SPEED if self.speed > 0 else -MAX_SPEED
 
+        self.update_bounds()
+        return hit
+
+
+class PlayerCar(arcade.Sprite):
+    """Класс игрового автомобиля, наследующий от arcade.Sprite.
+    Физика считается в self.state, спрайт только отображает ее результат."""
+    def __init__(self, filename, scale):
+        super().__init__(filename, scale)
+        scale_x, scale_y = self.scale
+        self.state = CarState([(x * scale_x, y * scale_y) for x, y in self.hit_box.points])
+        self.hit = None  # Препятствие, в которое машина уперлась за кадр
+
+    @property
+    def speed(self):
+        """Текущая скорость автомобиля"""
+        return self.state.speed
+
+    @speed.setter
+    def speed(self, value):
+        self.state.speed = value
+
+    @property
+    def angle_speed(self):
+        """Скорость вращения"""
+        return self.state.angle_speed
+
+    @angle_speed.setter
+    def angle_speed(self, value):
+        self.state.angle_speed = value
+
+    def place(self, x, y, angle):
+        """Установка машины в точку с заданным углом"""
+        self.state.x = x
+        self.state.y = y
+        self.state.angle = angle
+        self.state.update_bounds()
+        self.sync_to_sprite()
+
+    def sync_to_sprite(self):
+        """Перенос положения из состояния в спрайт (для отрисовки и arcade)"""
+        self.position = (self.state.x, self.state.y)
+        self.angle = self.state.angle
+
+    def sync_from_sprite(self):
+        """Перенос положения спрайта в состояние (после выталкивания из стен)"""
+        self.state.x, self.state.y = self.position
+        self.state.update_bounds()
+
+    def update(self, obstacles=()):
+        """Обновление состояния автомобиля каждый кадр
+        (спрайт синхронизируется отдельно через sync_to_sprite)"""
+        self.hit = self.state.step(obstacles)
+
+
+class ChunkedMap:
+    """Тайловая карта, разбитая на чанки с подгрузкой вокруг камеры"""
+    def __init__(self, tilemap, layer_names, chunk_size=CHUNK_SIZE):
+        self.layer_names = layer_names
+        self.chunk_pixels = chunk_size * tilemap.tile_width * tilemap.scaling
+        self.chunks = {}  # Спрайты каждого чанка по слоям
+        self.loaded = {}  # Подгруженные чанки: готовые SpriteList по слоям
+        self.margin = 0  # Наибольший полуразмер спрайта (выступ за чанк)
+
+        # Раскладываем спрайты по чанкам по положению центра
+        for name in layer_names:
+            for spr in tilemap.sprite_lists[name]:
+                key = (int(spr.center_x // self.chunk_pixels),
+                       int(spr.center_y // self.chunk_pixels))
+                chunk = self.chunks.setdefault(key, {n: [] for n in layer_names})
+                chunk[name].append(spr)
+                self.margin = max(self.margin, spr.width / 2, spr.height / 2)
+            # Спрайты теперь живут в списках чанков: отвязываем их от слоя карты
+            tilemap.sprite_lists[name].clear()
+
+    def _chunk_range(self, left, bottom, right, top, radius=0):
+        """Координаты чанков, пересекающих прямоугольник, с запасом radius"""
+        x0 = int((left - self.margin) // self.chunk_pixels) - radius
+        y0 = int((bottom - self.margin) // self.chunk_pixels) - radius
+        x1 = int((right + self.margin) // self.chunk_pixels) + radius
+        y1 = int((top + self.margin) // self.chunk_pixels) + radius
+        return x0, y0, x1, y1
+
+    def _get(self, key):
+        """Подгрузка чанка (создание SpriteList) при первом обращении"""
+        if key not in self.loaded:
+            self.loaded[key] = {}
+            for name, sprites in self.chunks[key].items():
+                sprite_list = arcade.SpriteList()
+                sprite_list.extend(sprites)
+                self.loaded[key][name] = sprite_list
+        return self.loaded[key]
+
+    def _lists(self, layer, left, bottom, right, top):
+        """SpriteList слоя для всех чанков, пересекающих прямоугольник"""
+        x0, y0, x1, y1 = self._chunk_range(left, bottom, right, top)
+        result = []
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                if (cx, cy) in self.chunks:
+                    sprite_list = self._get((cx, cy))[layer]
+                    if sprite_list:
+                        result.append(sprite_list)
+        return result
+
+    def update(self, left, bottom, right, top):
+        """Подгрузка чанков вокруг области камеры и выгрузка дальних"""
+        x0, y0, x1, y1 = self._chunk_range(left, bottom, right, top, CHUNK_LOAD_RADIUS)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                if (cx, cy) in self.chunks:
+                    self._get((cx, cy))
+
+        x0, y0, x1, y1 = self._chunk_range(left, bottom, right, top, CHUNK_UNLOAD_RADIUS)
+        for key in list(self.loaded):
+            if not (x0 <= key[0] <= x1 and y0 <= key[1] <= y1):
+                # Спрайты хранят ссылки на свои списки, поэтому списки чанка
+                # нужно очистить, иначе они не освободятся
+                for sprite_list in self.loaded.pop(key).values():
+                    sprite_list.clear()
+
+    def visible(self, layer, left, bottom, right, top):
+        """Списки спрайтов слоя, попадающие в область камеры"""
+        return self._lists(layer, left, bottom, right, top)
+
+    def nearby(self, layer, sprite, padding=0):
+        """Списки спрайтов слоя из чанков рядом со спрайтом (для коллизий)"""
+        return self._lists(layer, sprite.left - padding, sprite.bottom - padding,
+                           sprite.right + padding, sprite.top + padding)
+
+    def draw(self, layer, left, bottom, right, top):
+        """Отрисовка только видимых чанков слоя"""
+        for sprite_list in self.visible(layer, left, bottom, right, top):
+            sprite_list.draw()
+
+
+def encode_trace(trace):
+    """Упаковка записи заезда (x, y, угол на каждый тик) в компактную строку"""
+    return base64.b64encode(zlib.compress(trace.tobytes())).decode('ascii')
+
+
+def decode_trace(data):
+    """Распаковка записи заезда из строки"""
+    trace = array('f')
+    trace.frombytes(zlib.decompress(base64.b64decode(data)))
+    return trace
+
+
+class LeaderboardClient:
+    """Клиент таблицы рекордов, работающий в фоновом потоке.
+    Запросы копятся в очереди и отправляются пачками, игровой цикл
+    только читает готовых призраков из self.ghosts."""
+    def __init__(self, url, cache_path=GHOSTS_DB):
+        self.url = url
+        self.cache_path = cache_path
+        self.requests = queue.Queue()  # Очередь заданий для фонового потока
+        self.ghosts = {}  # Лучшие заезды по уровням: (тики, запись)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit_run(self, level, trace):
+        """Отправка заезда на сервер (без ожидания ответа)"""
+        self.requests.put(('upload', level, array('f', trace)))
+
+    def fetch_ghost(self, level):
+        """Запрос лучшего заезда уровня (без ожидания ответа)"""
+        self.requests.put(('fetch', level, None))
+
+    def get_ghost(self, level):
+        """Запись лучшего заезда уровня, если она уже загружена"""
+        ghost = self.ghosts.get(level)
+        return ghost[1] if ghost else None
+
+    def close(self):
+        """Отправка оставшихся запросов и остановка фонового потока"""
+        self.requests.put(None)
+        self.thread.join(timeout=LEADERBOARD_TIMEOUT)
+
+    def _request(self, method, path, payload=None):
+        """HTTP-запрос к серверу рекордов с ответом в JSON"""
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=LEADERBOARD_TIMEOUT) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def _store(self, cur, level, ticks, trace):
+        """Сохранение заезда в кэш, если он лучше известного"""
+        best = self.ghosts.get(level)
+        if best is not None and best[0] <= ticks:
+            return
+        self.ghosts[level] = (ticks, trace)
+        cur.execute("INSERT OR REPLACE INTO ghosts (Level, Ticks, Trace) VALUES (?, ?, ?)",
+                    (level, ticks, encode_trace(trace)))
+
+    def _open_cache(self):
+        """Открытие кэша призраков; при ошибке кэш работает только в памяти"""
+        try:
+            con = sqlite3.connect(self.cache_path)
+            cur = con.cursor()
+            cur.execute("CREATE TABLE IF NOT EXISTS ghosts (Level INT PRIMARY KEY, Ticks INT, Trace TEXT);")
+            for level, ticks, data in cur.execute("SELECT Level, Ticks, Trace FROM ghosts").fetchall():
+                self.ghosts[level] = (ticks, decode_trace(data))
+            con.commit()
+            return con
+        except (sqlite3.Error, ValueError, zlib.error) as e:
+            print(f'Кэш призраков недоступен: {e}')
+            self.ghosts.clear()
+            con = sqlite3.connect(':memory:')
+            con.execute("CREATE TABLE ghosts (Level INT PRIMARY KEY, Ticks INT, Trace TEXT);")
+            return con
+
+    def _process(self, con, batch, pending):
+        """Обработка пачки заданий: кэширование, отправка и загрузка заездов"""
+        cur = con.cursor()
+        uploads = [item for item in batch if item and item[0] == 'upload']
+        fetches = sorted({item[1] for item in batch if item and item[0] == 'fetch'})
+
+        for _, level, trace in uploads:
+            self._store(cur, level, len(trace) // 3, trace)
+        con.commit()
+
+        pending.extend((level, trace) for _, level, trace in uploads)
+        # Отправка и загрузка обрабатываются отдельно: ошибка одной
+        # не должна мешать другой
+        if pending:
+            self._upload(pending)
+        if fetches:
+            self._fetch(con, fetches)
+
+    def _upload(self, pending):
+        """Отправка накопившихся заездов одним запросом"""
+        try:
+            self._request('POST', '/runs', {'runs': [
+                {'level': level, 'ticks': len(trace) // 3, 'trace': encode_trace(trace)}
+                for level, trace in pending
+            ]})
+            pending.clear()
+        except urllib.error.HTTPError as e:
+            # Сервер отклонил запрос - повтор не поможет
+            print(f'Сервер рекордов ответил ошибкой: {e}')
+            pending.clear()
+        except (urllib.error.URLError, OSError):
+            # Сервер недоступен - неотправленные заезды уйдут вместе со следующей пачкой
+            del pending[:-LEADERBOARD_MAX_PENDING]
+
+    def _fetch(self, con, levels):
+        """Загрузка лучших заездов для уровней одним запросом"""
+        try:
+            ghosts = self._request('GET', '/ghosts?levels=' + ','.join(str(level) for level in levels))
+        except urllib.error.HTTPError as e:
+            print(f'Сервер рекордов ответил ошибкой: {e}')
+            return
+        except (urllib.error.URLError, OSError):
+            # Сервер недоступен - играем с локальным кэшем
+            return
+
+        cur = con.cursor()
+        for level, ghost in ghosts.items():
+            # Неверная запись одного уровня не мешает остальным
+            try:
+                trace = decode_trace(ghost['trace'])
+                if not trace or len(trace) % 3:
+                    raise ValueError('wrong trace length')
+                self._store(cur, int(level), len(trace) // 3, trace)
+            except (TypeError, KeyError, ValueError, zlib.error) as e:
+                print(f'Пропущен призрак уровня {level}: {e!r}')
+        con.commit()
+
+    def _run(self):
+        """Цикл фонового потока: сбор пачки заданий и обмен с сервером"""
+        con = self._open_cache()
+        pending = []  # Заезды, которые еще не удалось отправить
+        running = True
+        while running:
+            # Забираем все накопившиеся задания одной пачкой
+            batch = [self.requests.get()]
+            while True:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            running = None not in batch
+
+            try:
+                self._process(con, batch, pending)
+            except Exception as e:
+                # Ошибка одной пачки (неверный ответ сервера, сбой кэша)
+                # не должна останавливать поток
+                print(f'Ошибка таблицы рекордов: {e!r}')
+        con.close()
+
+
+class Telemetry:
+    """Запись телеметрии заездов в кольцевой буфер с фоновым сбросом
+    в сжатые файлы. Запись в буфер не выделяет память: буфер создается
+    заранее, а значения пишутся в готовые ячейки."""
+    def __init__(self, directory, capacity=TELEMETRY_CAPACITY):
+        self.directory = directory
+        self.capacity = capacity
+        self.buffer = array('f', bytes(4 * capacity * TELEMETRY_FIELDS))
+        self.head = 0  # Сколько записей добавлено всего
+        self.tail = 0  # Сколько записей уже сброшено на диск
+        self.dropped = 0  # Записи, потерянные при переполнении буфера
+        self.run = 0  # Номер текущего заезда
+        self.tick = 0  # Тик внутри заезда
+        self.file = None  # Текущий файл телеметрии
+        self.file_index = 0  # Номер файла в текущей сессии
+        self.file_size = 0  # Байт записано в текущий файл
+        self.stop_event = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def start_run(self):
+        """Начало нового заезда"""
+        self.run += 1
+        self.tick = 0
+
+    def record(self, level, x, y, angle, speed, inputs, event):
+        """Добавление записи в буфер (вызывается каждый кадр)"""
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.dropped += 1
+            return
+        i = head % self.capacity * TELEMETRY_FIELDS
+        buffer = self.buffer
+        buffer[i] = self.run
+        buffer[i + 1] = self.tick
+        buffer[i + 2] = level
+        buffer[i + 3] = x
+        buffer[i + 4] = y
+        buffer[i + 5] = angle
+        buffer[i + 6] = speed
+        buffer[i + 7] = inputs
+        buffer[i + 8] = event
+        self.tick += 1
+        self.head = head + 1
+
+    def close(self):
+        """Остановка фонового потока и сброс оставшихся записей"""
+        self.stop_event.set()
+        self.thread.join()
+
+    def _open_file(self):
+        """Открытие нового файла и удаление самых старых"""
+        if self.file:
+            self.file.close()
+        self.file_index += 1
+        name = time.strftime('telemetry-%Y%m%d-%H%M%S') + f'-{self.file_index:04d}.bin.gz'
+        self.file = gzip.open(os.path.join(self.directory, name), 'wb')
+        self.file_size = 0
+        files = sorted(f for f in os.listdir(self.directory) if f.startswith('telemetry-'))
+        for old in files[:-TELEMETRY_MAX_FILES]:
+            os.remove(os.path.join(self.directory, old))
+
+    def _flush(self):
+        """Сброс накопившихся записей буфера в файл"""
+        head, tail = self.head, self.tail
+        count = head - tail
+        if count == 0:
+            return
+        start = tail % self.capacity
+        first = min(count, self.capacity - start)
+        data = self.buffer[start * TELEMETRY_FIELDS:(start + first) * TELEMETRY_FIELDS].tobytes()
+        if count > first:
+            data += self.buffer[:(count - first) * TELEMETRY_FIELDS].tobytes()
+        self.tail = head
+
+        if self.file is None or self.file_size >= TELEMETRY_FILE_SIZE:
+            self._open_file()
+        self.file.write(data)
+        # Принудительный сброс сжатого потока, чтобы записи попали на диск
+        # и читались даже при аварийном завершении игры
+        self.file.flush()
+        self.file_size += len(data)
+
+    def _run(self):
+        """Цикл фонового потока: периодический сброс буфера"""
+        while not self.stop_event.wait(TELEMETRY_FLUSH_INTERVAL):
+            self._flush()
+        self._flush()
+        if self.file:
+            self.file.close()
+
+
+class GhostCar(arcade.Sprite):
+    """Полупрозрачная машина, повторяющая записанный заезд"""
+    def __init__(self, filename, scale, trace):
+        super().__init__(filename, scale)
+        self.trace = trace  # Записи (x, y, угол) подряд для каждого тика
+        self.tick = 0  # Текущий тик записи
+        self.alpha = GHOST_ALPHA
+
+    def step(self):
+        """Переход к следующему тику записи"""
+        i = self.tick * 3
+        if i + 2 < len(self.trace):
+            self.center_x = self.trace[i]
+            self.center_y = self.trace[i + 1]
+            self.angle = self.trace[i + 2]
+            self.tick += 1
+
 
 class WinParticles:
     """Система частиц для эффектов"""
@@ -139,6 +693,22 @@ class WinParticles:
             )
 
 
+class GameWindow(arcade.Window):
+    """Окно игры, владеющее фоновыми службами: таблицей рекордов и телеметрией.
+    Обе службы необязательны (None - выключены)."""
+    def __init__(self, width, height, title, leaderboard=None, telemetry=None, **kwargs):
+        super().__init__(width, height, title, **kwargs)
+        self.leaderboard = leaderboard  # Клиент таблицы рекордов
+        self.telemetry = telemetry  # Запись телеметрии заездов
+
+    def close_services(self):
+        """Остановка фоновых служб с отправкой оставшихся данных"""
+        if self.leaderboard:
+            self.leaderboard.close()
+        if self.telemetry:
+            self.telemetry.close()
+
+
 class MenuView(arcade.View):
     """Класс главного меню игры"""
     def __init__(self):
@@ -266,10 +836,9 @@ class GameView(arcade.View):
         self.level = 0  # Текущий уровень
         self.unlocked_levels = 0  # Количество открытых уровней
         self.player_sprite = None  # Спрайт игрока
-        self.collision = None  # Список спрайтов для коллизий
-        self.background = None  # Фоновые спрайты
-        self.decor = None  # Декоративные элементы
-        self.cars = None  # Машины-препятствия
+        self.tile_map = None  # Карта уровня, разбитая на чанки
+        self.camera = None  # Камера, следующая за игроком
+        self.gui_camera = None  # Камера для интерфейса
         self.parking_borders = ()  # Границы парковочного места
         self.physics_engine = None  # Движок физики для коллизий
         self.level_completed = False  # Флаг завершения уровня
@@ -279,6 +848,10 @@ class GameView(arcade.View):
         self.moving_forward = False  # Флаг движения вперед
         self.moving_backward = False  # Флаг движения назад
         self.particle_system = None  # Система частиц
+        self.trace = None  # Запись текущего заезда
+        self.ghost = None  # Машина-призрак лучшего заезда
+        self.wall_contact = False  # Касалась ли машина стены в прошлом кадре
+        self.car_contact = False  # Касалась ли машина другой машины в прошлом кадре
         self.con = sqlite3.connect("levels.db")
         self.cur = self.con.cursor()
         
@@ -290,38 +863,22 @@ class GameView(arcade.View):
         self.level_failed = False
         self.moving_forward = False
         self.moving_backward = False
+        self.wall_contact = False
+        self.car_contact = False
 
         # Загрузка тайловой карты уровня
         tilemap = arcade.load_tilemap(f'assets/levels/level{self.level}.tmx', TILE_SCALING)
 
-        # Расчет размеров карты и смещения для центрирования
+        # Расчет размеров карты
         self.map_width = tilemap.width * tilemap.tile_width
         self.map_height = tilemap.height * tilemap.tile_height
-        self.offset_x = (SCREEN_WIDTH - self.map_width) // 2
-        self.offset_y = (SCREEN_HEIGHT - self.map_height) // 2
-
-        # Загрузка слоев тайловой карты
-        self.collision = tilemap.sprite_lists['collision']
-        self.background = tilemap.sprite_lists['background']
-        self.decor = tilemap.sprite_lists['decor']
-        self.cars = tilemap.sprite_lists['cars']
 
-        # Корректировка позиций спрайтов с учетом смещения
-        for spr in self.collision:
-            spr.center_x += self.offset_x
-            spr.center_y += self.offset_y
+        # Разбиение слоев тайловой карты на чанки
+        self.tile_map = ChunkedMap(tilemap, ['background', 'decor', 'cars', 'collision'])
 
-        for spr in self.background:
-            spr.center_x += self.offset_x
-            spr.center_y += self.offset_y
-
-        for spr in self.decor:
-            spr.center_x += self.offset_x
-            spr.center_y += self.offset_y
-
-        for spr in self.cars:
-            spr.center_x += self.offset_x
-            spr.center_y += self.offset_y
+        # Камеры для игрового мира и интерфейса
+        self.camera = arcade.camera.Camera2D()
+        self.gui_camera = arcade.camera.Camera2D()
 
         # Загрузка и воспроизведение игровой музыки
         if not self.music:
@@ -332,14 +889,20 @@ class GameView(arcade.View):
         x, y, angle = LEVELS_DATA[self.level-1]['spawn_pos']
         self.parking_borders = LEVELS_DATA[self.level-1]['parking_borders']
         self.player_sprite = PlayerCar('assets/images/car.png', PLAYER_SCALING)
-        self.player_sprite.center_x = x
-        self.player_sprite.center_y = y
-        self.player_sprite.angle = angle
-        self.player_sprite.center_x += self.offset_x
-        self.player_sprite.center_y += self.offset_y
+        self.player_sprite.place(x, y, angle)
+        self._update_camera()
+
+        # Запись заезда и запрос призрака лучшего заезда
+        self.trace = array('f')
+        self.ghost = None
+        if self.window.leaderboard:
+            self.window.leaderboard.fetch_ghost(self.level)
+        if self.window.telemetry:
+            self.window.telemetry.start_run()
 
         # Создание интерфейса уровня
         self.batch = Batch()
+        self.world_batch = Batch()
         self.level_text = arcade.Text(f'Level {self.level}',
                                       10,
                                       SCREEN_HEIGHT - 10,
@@ -358,8 +921,8 @@ class GameView(arcade.View):
             # Создание обводки текста через смещенные копии
             for dx, dy in offsets:
                 text = arcade.Text('УПРАВЛЕНИЕ:\nWASD и стрелки',
-                122 + self.offset_x + dx,
-                SCREEN_HEIGHT - (26 + self.offset_y) + dy,
+                122 + dx,
+                self.map_height - 26 + dy,
                 (0, 0, 0),
                 24,
                 align='left',
@@ -368,12 +931,12 @@ class GameView(arcade.View):
                 font_name='Comic Sans MS',
                 multiline=True,
                 width=1111111111,
-                batch=self.batch)
+                batch=self.world_batch)
                 self.offseted_texts.append(text)
             # Основной текст обучения
             self.tutorial_text = arcade.Text('УПРАВЛЕНИЕ:\nWASD и стрелки',
-                                      122 + self.offset_x,
-                                      SCREEN_HEIGHT - (26 + self.offset_y),
+                                      122,
+                                      self.map_height - 26,
                                       (234, 205, 194),
                                       24,
                                       align='left',
@@ -382,29 +945,57 @@ class GameView(arcade.View):
                                       font_name='Comic Sans MS',
                                       multiline=True,
                                       width=1111111111,
-                                      batch=self.batch)
+                                      batch=self.world_batch)
 
         # Создание физического движка для обработки коллизий
+        # (стены подставляются из ближайших чанков каждый кадр)
         self.physics_engine = arcade.PhysicsEngineSimple(player_sprite=self.player_sprite,
-                                                         walls=self.collision)
+                                                         walls=[])
         
         self.particle_system = WinParticles()
 
+    def _camera_bounds(self):
+        """Границы области карты, видимой камерой"""
+        x, y = self.camera.position
+        return (x - SCREEN_WIDTH / 2, y - SCREEN_HEIGHT / 2,
+                x + SCREEN_WIDTH / 2, y + SCREEN_HEIGHT / 2)
+
+    def _update_camera(self):
+        """Слежение камеры за игроком в пределах карты"""
+        def follow(pos, map_size, screen_size):
+            # Карта меньше экрана - центрируем ее
+            if map_size <= screen_size:
+                return map_size / 2
+            return min(max(pos, screen_size / 2), map_size - screen_size / 2)
+
+        self.camera.position = (
+            follow(self.player_sprite.state.x, self.map_width, SCREEN_WIDTH),
+            follow(self.player_sprite.state.y, self.map_height, SCREEN_HEIGHT)
+        )
+        self.tile_map.update(*self._camera_bounds())
+
     def on_draw(self):
         """Отрисовка всех элементов уровня"""
         self.clear()
-        # Отрисовка слоев в правильном порядке
-        self.background.draw()
-        self.decor.draw()
+        # Отрисовка видимых чанков в правильном порядке
+        self.camera.use()
+        bounds = self._camera_bounds()
+        self.tile_map.draw('background', *bounds)
+        self.tile_map.draw('decor', *bounds)
+        if self.ghost:
+            arcade.draw_sprite(self.ghost)
         arcade.draw_sprite(self.player_sprite)
-        self.cars.draw()
-        self.batch.draw()
+        self.tile_map.draw('cars', *bounds)
+        self.world_batch.draw()
         # Отрисовка UI поверх игры
+        self.gui_camera.use()
+        self.batch.draw()
         if self.level_failed:
             self._draw_game_over_ui()
         elif self.level_completed:
             self._draw_level_complete_ui()
         if self.particle_system:
+            self.camera.use()
             self.particle_system.draw()
 
     def _draw_level_complete_ui(self):
@@ -655,25 +1246,66 @@ class GameView(arcade.View):
     def on_update(self, delta_time):
         """Обновление игровой логики каждый кадр"""
         if not self.level_completed and not self.level_failed:
-            # Обновление состояния автомобиля
-            self.player_sprite.update()
+            # Физика считается на компактном состоянии машины, а не на спрайте
+            state = self.player_sprite.state
+
+            # Препятствия рядом с игроком с учетом пути за кадр
+            reach = abs(state.speed)
+            walls = self.tile_map.nearby('collision', state, reach)
+            cars = self.tile_map.nearby('cars', state, reach)
+
+            # Обновление состояния автомобиля с непрерывной проверкой столкновений
+            self.player_sprite.update(walls + cars)
             
             # Ограничение движения в пределах карты
-            if self.player_sprite.right > 640 + self.offset_x:
-                self.player_sprite.right = 640 + self.offset_x
-            if self.player_sprite.left < self.offset_x:
-                self.player_sprite.left = self.offset_x
-            if self.player_sprite.bottom < self.offset_y:
-                self.player_sprite.bottom = self.offset_y
-            if self.player_sprite.top > 640 + self.offset_y:
-                self.player_sprite.top = 640 + self.offset_y
+            if state.right > self.map_width:
+                state.shift(self.map_width - state.right, 0)
+            if state.left < 0:
+                state.shift(-state.left, 0)
+            if state.bottom < 0:
+                state.shift(0, -state.bottom)
+            if state.top > self.map_height:
+                state.shift(0, self.map_height - state.top)
+            self.player_sprite.sync_to_sprite()
             
-            # Обновление физического движка
+            # Обновление физического движка (только стены из ближайших чанков);
+            # сеттер walls в arcade добавляет к списку, поэтому заменяем содержимое
+            self.physics_engine.walls[:] = walls
             self.physics_engine.update()
+            # Движок выталкивает машину из стен, не возвращая столкновений,
+            # поэтому касание определяется по сдвигу спрайта
+            pushed_out = self.player_sprite.position != (state.x, state.y)
+            if pushed_out:
+                self.player_sprite.sync_from_sprite()
+
+            # Событие телеметрии записывается только в начале касания
+            event = EVENT_NONE
+            hit = self.player_sprite.hit
+            wall_contact = pushed_out or (hit is not None
+                                          and any(hit in sprite_list for sprite_list in walls))
+            if wall_contact and not self.wall_contact:
+                event = EVENT_WALL
+            self.wall_contact = wall_contact
             
-            # Проверка столкновений с другими машинами
-            colliding_with_cars = arcade.check_for_collision_with_list(self.player_sprite, self.cars)
-            if len(colliding_with_cars) > 0:
+            # Запись положения игрока и шаг призрака
+            self.trace.extend((state.x, state.y, state.angle))
+            if self.ghost is None and self.window.leaderboard:
+                trace = self.window.leaderboard.get_ghost(self.level)
+                if trace is not None:
+                    self.ghost = GhostCar('assets/images/car.png', PLAYER_SCALING, trace)
+                    self.ghost.tick = len(self.trace) // 3 - 1
+            if self.ghost:
+                self.ghost.step()
+            
+            # Проверка столкновений с машинами из ближайших чанков
+            colliding_with_cars = arcade.check_for_collision_with_lists(self.player_sprite, cars)
+            if hit is not None and any(hit in sprite_list for sprite_list in cars):
+                colliding_with_cars.append(hit)
+            car_contact = len(colliding_with_cars) > 0
+            if car_contact and not self.car_contact:
+                event = EVENT_CRASH
+            self.car_contact = car_contact
+            if car_contact:
                 if not CHEAT_MODE:
                     self.level_failed = True
                     if self.music_player:
@@ -685,27 +1317,47 @@ class GameView(arcade.View):
                     print('player died')
 
             # Проверка успешной парковки (нахождение в границах парковочного места)
-            if (self.player_sprite.left > self.parking_borders[0] + self.offset_x
-                and self.player_sprite.bottom > self.parking_borders[1] + self.offset_y
-                and self.player_sprite.right < self.parking_borders[2] + self.offset_x
-                and self.player_sprite.top < self.parking_borders[3] + self.offset_y):
+            if (state.left > self.parking_borders[0]
+                and state.bottom > self.parking_borders[1]
+                and state.right < self.parking_borders[2]
+                and state.top < self.parking_borders[3]):
                 self.level_completed = True
+                event = EVENT_COMPLETE
                 if self.music_player:
                     self.music.stop(self.music_player)
+                if self.window.leaderboard:
+                    self.window.leaderboard.submit_run(self.level, self.trace)
                 self.particle_system.emit_confetti(
-                    self.player_sprite.center_x,
-                    self.player_sprite.center_y,
+                    state.x,
+                    state.y,
                     count=100 if self.level == 5 else 50
                 )
                 # Проигрываем звук победы
                 win_sound = arcade.Sound('assets/sounds/win.mp3')
                 win_sound.play(volume=0.5)
 
+            # Запись телеметрии кадра
+            if self.window.telemetry:
+                inputs = ((INPUT_FORWARD if self.moving_forward else 0)
+                          | (INPUT_BACKWARD if self.moving_backward else 0)
+                          | (INPUT_LEFT if state.angle_speed < 0 else 0)
+                          | (INPUT_RIGHT if state.angle_speed > 0 else 0))
+                self.window.telemetry.record(self.level,
+                                             state.x,
+                                             state.y,
+                                             state.angle,
+                                             state.speed,
+                                             inputs,
+                                             event)
+
             # Применение ускорения при удержании клавиш движения
             if self.moving_forward:
-                self.player_sprite.speed += ACCELERATION_RATE
+                state.speed += ACCELERATION_RATE
             elif self.moving_backward:
-                self.player_sprite.speed -= ACCELERATION_RATE
+                state.speed -= ACCELERATION_RATE
+
+            # Камера следует за игроком, подгружая чанки вокруг себя
+            self._update_camera()
 
         if self.particle_system:
             self.particle_system.update()
@@ -740,11 +1392,16 @@ class GameView(arcade.View):
 
 def main():
     """Основная функция инициализации игры"""
-    window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
+    window = GameWindow(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE,
+                        leaderboard=LeaderboardClient(LEADERBOARD_URL),
+                        telemetry=Telemetry(TELEMETRY_DIR) if TELEMETRY_ENABLED else None)
     menu_view = MenuView()
     menu_view.setup()
     window.show_view(menu_view)
-    arcade.run()
+    try:
+        arcade.run()
+    finally:
+        window.close_services()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,92 @@
+import os
+import zlib
+import argparse
+from array import array
+from PIL import Image
+import main
+
+# Символы для отображения плотности в консоли (от пустой клетки к самой частой)
+SHADES = ' .:-=+*#%@'
+
+
+def read_records(directory):
+    """Чтение всех записей телеметрии из папки"""
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith('telemetry-') and name.endswith('.bin.gz')):
+            continue
+        with open(os.path.join(directory, name), 'rb') as f:
+            # Файл может быть недописан (аварийное завершение или игра еще идет):
+            # decompressobj отдает все, что удалось распаковать до обрыва
+            data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(f.read())
+        records = array('f')
+        # Недописанную последнюю запись отбрасываем
+        size = len(data) - len(data) % (records.itemsize * main.TELEMETRY_FIELDS)
+        records.frombytes(data[:size])
+        for i in range(0, len(records), main.TELEMETRY_FIELDS):
+            yield records[i:i + main.TELEMETRY_FIELDS]
+
+
+def build_heatmaps(records, events, cell):
+    """Подсчет событий по клеткам карты для каждого уровня"""
+    heatmaps = {}
+    for record in records:
+        if int(record[8]) not in events:
+            continue
+        level = int(record[2])
+        key = (int(record[3] // cell), int(record[4] // cell))
+        level_map = heatmaps.setdefault(level, {})
+        level_map[key] = level_map.get(key, 0) + 1
+    return heatmaps
+
+
+def print_heatmap(level, level_map):
+    """Вывод тепловой карты уровня в консоль (верх карты сверху)"""
+    width = max(x for x, _ in level_map) + 1
+    height = max(y for _, y in level_map) + 1
+    peak = max(level_map.values())
+    print(f'Уровень {level}: {sum(level_map.values())} событий')
+    for y in range(height - 1, -1, -1):
+        row = ''
+        for x in range(width):
+            count = level_map.get((x, y), 0)
+            row += SHADES[(count * (len(SHADES) - 1) + peak - 1) // peak]
+        print('|' + row + '|')
+    print()
+
+
+def save_heatmap(path, level_map, cell):
+    """Сохранение тепловой карты уровня в PNG (одна клетка - cell пикселей)"""
+    width = max(x for x, _ in level_map) + 1
+    height = max(y for _, y in level_map) + 1
+    peak = max(level_map.values())
+    image = Image.new('RGB', (width, height))
+    for (x, y), count in level_map.items():
+        heat = int(255 * count / peak)
+        image.putpixel((x, height - 1 - y), (heat, 0, 255 - heat))
+    image.resize((width * cell, height * cell), Image.NEAREST).save(path)
+
+
+def main_heatmap():
+    """Построение тепловых карт аварий по уровням"""
+    parser = argparse.ArgumentParser(description='Тепловые карты аварий по телеметрии Parking Pro')
+    parser.add_argument('directory', nargs='?', default=main.TELEMETRY_DIR)
+    parser.add_argument('--cell', type=int, default=32, help='размер клетки в пикселях карты')
+    parser.add_argument('--walls', action='store_true', help='учитывать упоры в стены')
+    parser.add_argument('--png', metavar='DIR', help='сохранить карты в PNG в указанную папку')
+    args = parser.parse_args()
+
+    events = {main.EVENT_CRASH, main.EVENT_WALL} if args.walls else {main.EVENT_CRASH}
+    heatmaps = build_heatmaps(read_records(args.directory), events, args.cell)
+    if not heatmaps:
+        print('Нет событий для построения карт')
+        return
+
+    for level in sorted(heatmaps):
+        print_heatmap(level, heatmaps[level])
+        if args.png:
+            os.makedirs(args.png, exist_ok=True)
+            save_heatmap(os.path.join(args.png, f'level{level}.png'), heatmaps[level], args.cell)
+
+
+if __name__ == "__main__":
+    main_heatmap()